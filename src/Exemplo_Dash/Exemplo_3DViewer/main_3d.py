@@ -1,4 +1,5 @@
-import base64, io
+import base64, hashlib, io, os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import plotly.graph_objects as go
 import trimesh as tm
@@ -30,15 +31,25 @@ def empty_fig(msg="📄 Faça upload de um STL/OBJ/PLY."):
     )
     return fig
 
-def mesh_to_figure(mesh: tm.Trimesh) -> go.Figure:
+def mesh_to_figure(mesh: tm.Trimesh, overhang=None) -> go.Figure:
     V = mesh.vertices
     F = mesh.faces
+    # Sem análise: cor única; com análise: cada face colorida pelo ângulo de overhang
+    if overhang is None:
+        cores = dict(color=ACCENT)
+    else:
+        cores = dict(
+            intensity=overhang, intensitymode="cell",
+            colorscale=OVERHANG_COLORSCALE, cmin=0, cmax=90,
+            colorbar=dict(title=dict(text="Overhang (°)", font=dict(color="#A8A8A8")),
+                          tickfont=dict(color="#A8A8A8"), thickness=12),
+        )
     fig = go.Figure(
         data=[
             go.Mesh3d(
                 x=V[:, 0], y=V[:, 1], z=V[:, 2],
                 i=F[:, 0], j=F[:, 1], k=F[:, 2],
-                color=ACCENT, opacity=1.0, flatshading=True,
+                **cores, opacity=1.0, flatshading=True,
                 lighting=dict(ambient=0.45, diffuse=0.8, specular=0.7, roughness=0.45),
                 lightposition=dict(x=1200, y=1200, z=1200),
                 hoverinfo="skip",
@@ -60,6 +71,294 @@ def mesh_to_figure(mesh: tm.Trimesh) -> go.Figure:
     fig.update_layout(scene_camera=dict(eye=dict(x=1.8, y=1.8, z=1.2)))
     return fig
 
+# ---------------------------------------------------------------------------
+# Análise de suporte (overhang) — só numpy, sem GPU
+# ---------------------------------------------------------------------------
+
+# Faces inclinadas mais que isso em relação à vertical precisam de suporte
+OVERHANG_DEG = 45.0
+
+# Azul (ok) até o ângulo crítico, depois amarelo → vermelho
+OVERHANG_COLORSCALE = [
+    [0.0, ACCENT],
+    [OVERHANG_DEG / 90, ACCENT],
+    [OVERHANG_DEG / 90 + 0.05, "#FFD166"],
+    [1.0, "#FF4D4D"],
+]
+
+# Células do mapa de alturas (grade XY) usadas em cada estimativa de suporte
+GRID_CELLS = 250_000
+
+# Elementos por bloco na rasterização, somando todas as threads (limita o pico de memória)
+RASTER_BUDGET = 1_000_000
+
+# Orientações de aresta/canto só são sugeridas se precisarem de bem menos suporte
+# que a melhor orientação "deitada numa face" (fração do volume dela)
+CLEARLY_BETTER = 0.5
+
+
+def overhang_angles(normals: np.ndarray) -> np.ndarray:
+    """Ângulo (graus) de cada face além da vertical: 0 = parede/topo, 90 = teto plano."""
+    return np.degrees(np.arcsin(np.clip(-normals[:, 2], 0.0, 1.0)))
+
+
+def _needs_support(z, F, nz):
+    """Máscara das faces em overhang que não estão encostadas na mesa (z mínimo = 0)."""
+    needs = -nz > np.sin(np.radians(OVERHANG_DEG))
+    ids = np.flatnonzero(needs)
+    zf = z[F[ids]]
+    top = np.maximum(np.maximum(zf[:, 0], zf[:, 1]), zf[:, 2])
+    needs[ids[top <= 1e-4 * max(float(z.max()), 1e-9)]] = False
+    return needs
+
+
+def _chunks(counts, budget):
+    """Fatias consecutivas de `counts` cuja soma não passa de `budget` (ao menos 1 item cada)."""
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        base = ends[start - 1] if start else 0
+        stop = max(int(np.searchsorted(ends, base + budget, side="right")), start + 1)
+        yield slice(start, stop)
+        start = stop
+
+
+def _rasterize(V, F, ids, lo, h, shape, chunk=RASTER_BUDGET):
+    """Rasteriza as faces `ids` na grade XY: devolve (célula, z) de cada centro de célula coberto.
+
+    Varredura por linhas: cada triângulo gera uma entrada por linha da grade que
+    ele cruza e, nela, só as células entre as duas arestas. O trabalho acompanha
+    as células cobertas (e não o retângulo envolvente, que explode em triângulos
+    finos de "leque"), e é feito em blocos de até `chunk` elementos.
+    """
+    nx, ny = shape
+    A, B, C = V[F[ids, 0]], V[F[ids, 1]], V[F[ids, 2]]
+    e1, e2 = B - A, C - A
+    det = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+    ok = det != 0  # triângulos de pé não cobrem área em XY
+    A, B, C, e1, e2, det = A[ok], B[ok], C[ok], e1[ok], e2[ok], det[ok]
+
+    # Plano de cada triângulo: z = A_z + gx (x - A_x) + gy (y - A_y)
+    gx = (e1[:, 2] * e2[:, 1] - e2[:, 2] * e1[:, 1]) / det
+    gy = (e2[:, 2] * e1[:, 0] - e1[:, 2] * e2[:, 0]) / det
+
+    # Linhas de centros de célula ((j + 0.5) * h) cruzadas por cada triângulo
+    ymin = np.minimum(np.minimum(A[:, 1], B[:, 1]), C[:, 1])
+    ymax = np.maximum(np.maximum(A[:, 1], B[:, 1]), C[:, 1])
+    j0 = np.clip(np.ceil((ymin - lo[1]) / h - 0.5), 0, None).astype(np.int64)
+    j1 = np.minimum(np.floor((ymax - lo[1]) / h - 0.5).astype(np.int64), ny - 1)
+    rows = np.clip(j1 - j0 + 1, 0, None)
+    edges = ((A, B), (B, C), (C, A))
+
+    cells, zs = [], []
+    for part in _chunks(rows, chunk):
+        n = rows[part]
+        tri = np.repeat(np.arange(part.start, part.stop), n)
+        cy = j0[tri] + np.arange(tri.size) - np.repeat(np.cumsum(n) - n, n)
+        y = lo[1] + (cy + 0.5) * h
+
+        # Intervalo em x da linha dentro do triângulo (arestas horizontais não contam:
+        # as outras duas já passam pelas pontas delas)
+        xl = np.full(tri.size, np.inf)
+        xr = np.full(tri.size, -np.inf)
+        for P, Q in edges:
+            py, qy = P[tri, 1], Q[tri, 1]
+            dy = qy - py
+            t = (y - py) / np.where(dy == 0, 1.0, dy)
+            cross = (dy != 0) & (t >= 0) & (t <= 1)
+            x = P[tri, 0] + t * (Q[tri, 0] - P[tri, 0])
+            xl = np.where(cross, np.minimum(xl, x), xl)
+            xr = np.where(cross, np.maximum(xr, x), xr)
+
+        hit = xl <= xr
+        tri, cy, xl, xr = tri[hit], cy[hit], xl[hit], xr[hit]
+        i0 = np.clip(np.ceil((xl - lo[0]) / h - 0.5), 0, None).astype(np.int64)
+        i1 = np.minimum(np.floor((xr - lo[0]) / h - 0.5).astype(np.int64), nx - 1)
+        count = np.clip(i1 - i0 + 1, 0, None)
+
+        for sub in _chunks(count, chunk):
+            m = count[sub]
+            r = np.repeat(np.arange(sub.start, sub.stop), m)
+            cx = i0[r] + np.arange(r.size) - np.repeat(np.cumsum(m) - m, m)
+            t, cyr = tri[r], cy[r]
+            z = (A[t, 2] + gx[t] * (lo[0] + (cx + 0.5) * h - A[t, 0])
+                 + gy[t] * (lo[1] + (cyr + 0.5) * h - A[t, 1]))
+            cells.append(cx * ny + cyr)
+            zs.append(z)
+
+    if not cells:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(cells), np.concatenate(zs)
+
+
+def support_volume(V, F, normals, cells=GRID_CELLS, chunk=RASTER_BUDGET):
+    """Estima o volume de suporte com a peça apoiada na mesa (z mínimo = 0).
+
+    As faces em overhang e as faces voltadas para cima ("pisos") são rasterizadas
+    na mesma grade XY. Cada célula de overhang desce até o piso mais alto abaixo
+    dela na mesma coluna, ou até a mesa. Os pisos são ordenados por (célula, z),
+    de modo que um único `searchsorted` acha o piso de todas as células de uma vez.
+
+    Retorna (volume, máscara das faces que precisam de suporte).
+    """
+    z = V[:, 2] - V[:, 2].min()
+    V = np.column_stack([V[:, :2], z])
+    needs = _needs_support(z, F, normals[:, 2])
+    if not needs.any():
+        return 0.0, needs
+
+    lo = V[:, :2].min(axis=0)
+    size = np.maximum(np.ptp(V[:, :2], axis=0), 1e-9)
+    h = np.sqrt(size[0] * size[1] / cells)
+    shape = tuple((size // h).astype(np.int64) + 1)
+
+    cd, zd = _rasterize(V, F, np.flatnonzero(needs), lo, h, shape, chunk)
+    cu, zu = _rasterize(V, F, np.flatnonzero(normals[:, 2] > 0), lo, h, shape, chunk)
+
+    # Chave única (célula, z): z < span garante que a célula domina a ordenação
+    span = float(z.max()) + 1.0
+    kd = np.sort(cd * span + zd)
+    ku = np.sort(cu * span + zu)
+
+    # Centros na aresta entre dois triângulos do mesmo overhang contam uma vez só
+    kd = kd[np.r_[True, np.diff(kd) > 1e-9 * span]]
+    cd = (kd // span).astype(np.int64)
+    zd = kd - cd * span
+
+    pos = np.searchsorted(ku, kd, side="right") - 1
+    below = ku[np.maximum(pos, 0)]
+    hit = (pos >= 0) & ((below // span).astype(np.int64) == cd)
+    floor = np.where(hit, below - cd * span, 0.0)
+
+    volume = float(np.sum(np.clip(zd - floor, 0.0, None)) * h * h)
+    return volume, needs
+
+
+def _rotation_to_z(d: np.ndarray) -> np.ndarray:
+    """Matriz de rotação que leva o vetor `d` para +Z (fórmula de Rodrigues)."""
+    d = d / np.linalg.norm(d)
+    c = d[2]
+    if c > 1 - 1e-9:
+        return np.eye(3)
+    if c < -1 + 1e-9:
+        return np.diag([1.0, -1.0, -1.0])  # 180° em torno de X
+    v = np.cross(d, [0.0, 0.0, 1.0])
+    K = np.array([[0, -v[2], v[1]], [v[2], 0, -v[0]], [-v[1], v[0], 0]])
+    return np.eye(3) + K + K @ K / (1 + c)
+
+
+# Candidatos: 26 direções do cubo que podem ficar "para cima". A orientação atual vem
+# primeiro, depois as outras 5 faces, depois arestas e cantos.
+CANDIDATE_UPS = np.array(
+    sorted(
+        ((x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1) if (x, y, z) != (0, 0, 0)),
+        key=lambda d: (d != (0, 0, 1), sum(map(abs, d))),
+    ),
+    dtype=float,
+)
+N_FACE_UPS = 6
+
+
+def _support_bound(V, F, normals, areas, up):
+    """Filtro rápido: área projetada em overhang × altura do centro da face (sem pisos)."""
+    R = _rotation_to_z(up)
+    z = V @ R[2]
+    z -= z.min()
+    nz = normals @ R[2]
+    ids = np.flatnonzero(_needs_support(z, F, nz))
+    zf = z[F[ids]]
+    return float(np.sum(areas[ids] * -nz[ids] * (zf[:, 0] + zf[:, 1] + zf[:, 2])) / 3)
+
+
+def _pick(volumes, eps):
+    """Índice da primeira orientação empatada (até 1% + eps) com o menor volume."""
+    volumes = np.asarray(volumes)
+    return int(np.flatnonzero(volumes <= volumes.min() * 1.01 + eps)[0])
+
+
+def best_orientation(V, F, normals, areas, current_volume, candidates=CANDIDATE_UPS):
+    """Sugere a orientação de menor suporte; devolve (direção para cima, volume).
+
+    As 6 faces recebem a estimativa completa; das arestas e cantos só a melhor
+    pelo filtro barato (limite superior sem pisos) é estimada. As estimativas rodam
+    em paralelo com threads (numpy libera o GIL e a malha não é copiada entre
+    processos) e dividem `RASTER_BUDGET`. A orientação atual (candidata 0) entra com `current_volume`,
+    calculado na mesma grade, então a comparação não depende de ruído.
+    Arestas e cantos só vencem se forem claramente melhores (`CLEARLY_BETTER`):
+    peças apoiadas numa quina não imprimem bem, mesmo com pouco suporte.
+    """
+    bounds = np.array([0.0] + [_support_bound(V, F, normals, areas, up) for up in candidates[1:]])
+    other = N_FACE_UPS + int(np.argmin(bounds[N_FACE_UPS:]))
+    finalists = [*range(1, N_FACE_UPS), other]
+
+    # As threads dividem o orçamento de memória da rasterização
+    workers = min(len(finalists), os.cpu_count() or 1)
+    chunk = RASTER_BUDGET // workers
+
+    def volume_for(i):
+        if bounds[i] == 0:
+            return 0.0  # nada em overhang: não precisa rasterizar
+        R = _rotation_to_z(candidates[i])
+        return support_volume(V @ R.T, F, normals @ R.T, chunk=chunk)[0]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        volumes = dict(zip(finalists, pool.map(volume_for, finalists)))
+    volumes[0] = current_volume
+
+    eps = 1e-6 * float(np.prod(np.maximum(np.ptp(V, axis=0), 1e-9)))
+    best = _pick([volumes[i] for i in range(N_FACE_UPS)], eps)
+    if volumes[other] < CLEARLY_BETTER * volumes[best] - eps:
+        best = other
+    return candidates[best] / np.linalg.norm(candidates[best]), float(volumes[best])
+
+
+def analyze_mesh(mesh: tm.Trimesh) -> dict:
+    """Overhang por face, suporte na orientação atual e orientação sugerida."""
+    V = np.asarray(mesh.vertices, dtype=float)
+    F = np.asarray(mesh.faces, dtype=np.int64)
+    N = np.asarray(mesh.face_normals, dtype=float)
+    A = np.asarray(mesh.area_faces, dtype=float)
+
+    volume, needs = support_volume(V, F, N)
+    up, best_volume = best_orientation(V, F, N, A, volume)
+
+    # Faces acima do ângulo crítico mas apoiadas na mesa não ficam vermelhas:
+    # as cores mostram exatamente as faces que o relatório conta
+    overhang = overhang_angles(N)
+    overhang[(overhang > OVERHANG_DEG) & ~needs] = 0.0
+    return dict(
+        overhang=overhang,
+        faces=len(F),
+        faces_support=int(needs.sum()),
+        overhang_area=float(A[needs].sum()),
+        support_volume=volume,
+        best_up=up,
+        best_volume=best_volume,
+    )
+
+
+def analysis_report(info: dict):
+    """Resumo da análise para o cartão de relatório (unidades do arquivo, normalmente mm)."""
+    if info["faces_support"] == 0:
+        status = "✅ O modelo não precisa de suportes nesta orientação."
+    else:
+        status = f"⚠️ O modelo precisa de suportes ({info['faces_support']:,} faces acima de {OVERHANG_DEG:.0f}°)."
+
+    up = ", ".join(f"{c:+.2f}" for c in info["best_up"])
+    if np.allclose(info["best_up"], [0, 0, 1]):
+        sugestao = "Orientação atual já é a que usa menos suporte."
+    else:
+        sugestao = (f"Sugestão: deixar a direção ({up}) do modelo para cima — "
+                    f"suporte estimado {info['best_volume'] / 1000:.2f} cm³.")
+
+    return [
+        html.B(status),
+        html.Div(f"Faces: {info['faces']:,} · Área em overhang: {info['overhang_area'] / 100:.2f} cm²"),
+        html.Div(f"Volume de suporte estimado: {info['support_volume'] / 1000:.2f} cm³"),
+        html.Div(sugestao),
+    ]
+
+
 app.layout = html.Div(
     className="page",
     children=[
@@ -98,6 +397,9 @@ app.layout = html.Div(
                     ),
                 ),
 
+                # Relatório da análise de suporte
+                html.Div(id="report", className="card report", children="Nenhum modelo carregado."),
+
                 # Gráfico 3D
                 html.Div(
                     className="card graph-card",
@@ -113,16 +415,20 @@ app.layout = html.Div(
     ]
 )
 
-@callback(
-    Output("graph3d", "figure"),
-    Input("upload-model", "contents"),
-    Input("upload-model", "filename"),
-    Input("chk-wire", "value"),
-)
-def render_model(contents, filename, flags):
-    if not contents or not filename:
-        return empty_fig()
+# Últimas análises, por (sha1 do upload, nome do arquivo): o wireframe e outros
+# controles reutilizam o resultado sem guardar o base64 do upload
+ANALYSES_KEPT = 4
+_analyses = {}
+
+def load_and_analyze(contents, filename):
+    key = (hashlib.sha1(contents.encode()).hexdigest(), filename)
+    if key not in _analyses:
+        _analyses[key] = _load_and_analyze(contents, filename)
+        while len(_analyses) > ANALYSES_KEPT:
+            _analyses.pop(next(iter(_analyses)))  # descarta a mais antiga
+    return _analyses[key]
 
+def _load_and_analyze(contents, filename):
     # Decodifica o arquivo base64
     header, b64 = contents.split(",")
     data = base64.b64decode(b64)
@@ -138,10 +444,27 @@ def render_model(contents, filename, flags):
     else:
         geoms = list(getattr(obj, "geometry", {}).values())
         if not geoms:
-            return empty_fig("Não foi possível ler a malha.")
+            return None, None
         mesh = tm.util.concatenate(geoms)
 
-    fig = mesh_to_figure(mesh)
+    return mesh, analyze_mesh(mesh)
+
+@callback(
+    Output("graph3d", "figure"),
+    Output("report", "children"),
+    Input("upload-model", "contents"),
+    Input("upload-model", "filename"),
+    Input("chk-wire", "value"),
+)
+def render_model(contents, filename, flags):
+    if not contents or not filename:
+        return empty_fig(), "Nenhum modelo carregado."
+
+    mesh, info = load_and_analyze(contents, filename)
+    if mesh is None:
+        return empty_fig("Não foi possível ler a malha."), "Não foi possível ler a malha."
+
+    fig = mesh_to_figure(mesh, overhang=info["overhang"])
 
     # Wireframe opcional
     if "wire" in (flags or []):
@@ -156,7 +479,7 @@ def render_model(contents, filename, flags):
         )
         fig.add_trace(seg)
 
-    return fig
+    return fig, analysis_report(info)
 
 if __name__ == "__main__":
     # Ajuste host/porta conforme sua rede